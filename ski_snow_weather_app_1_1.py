@@ -1,18 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import functools
 import json
+import mmap
 import os
-import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json works too
+    orjson = None
 
 import openmeteo_requests
 import requests_cache
+from requests.adapters import HTTPAdapter
 from retry_requests import retry
 
 # -------------------------
 # Open-Meteo setup
 # -------------------------
-cache_session = requests_cache.CachedSession(".cache", expire_after=3600)
+# In-memory cache: a session only ever fetches a handful of locations, no need for SQLite on disk
+cache_session = requests_cache.CachedSession(backend="memory", expire_after=3600)
 retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+# retry() mounts its own adapter, so size the keep-alive pool afterwards and keep its Retry policy
+retry_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=retry_session.get_adapter("https://").max_retries,
+))
 openmeteo = openmeteo_requests.Client(session=retry_session)
 
 # -------------------------
@@ -35,15 +52,37 @@ DEFAULT_SETTINGS = {
 }
 
 
+def _read_json(path):
+    if orjson is not None:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:  # mmap can't map an empty file
+                return orjson.loads(f.read())
+            # Parse straight from the mapped pages instead of copying the file into a bytes object
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as buf:
+                return orjson.loads(buf)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    # Write to a temp file and swap it in, so a crash mid-write never leaves a truncated file
+    tmp_path = path + ".tmp"
+    if orjson is not None:
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
 def load_locations():
     if not os.path.exists(LOCATIONS_FILE):
         data = {"locations": DEFAULT_LOCATIONS, "settings": DEFAULT_SETTINGS}
-        with open(LOCATIONS_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        _write_json(LOCATIONS_FILE, data)
         return data
 
-    with open(LOCATIONS_FILE, "r") as f:
-        data = json.load(f)
+    data = _read_json(LOCATIONS_FILE)
 
     # Backward-compat: if old format {"Name": [lat, lon] or (lat, lon)}, convert it
     # Also backward-compat: if file only had locations dict at top level, migrate to {"locations": ..., "settings": ...}
@@ -54,71 +93,102 @@ def load_locations():
             if isinstance(v, (list, tuple)) and len(v) == 2:
                 locations[k] = {"lat": float(v[0]), "lon": float(v[1])}
         data = {"locations": locations, "settings": DEFAULT_SETTINGS}
-        with open(LOCATIONS_FILE, "w") as f2:
-            json.dump(data, f2, indent=2)
+        _write_json(LOCATIONS_FILE, data)
         return data
 
+    dirty = False
+
     # If locations are still in old tuple/list form inside the new structure
-    for k, v in list(data["locations"].items()):
-        if isinstance(v, (list, tuple)) and len(v) == 2:
-            data["locations"][k] = {"lat": float(v[0]), "lon": float(v[1])}
+    if any(isinstance(v, (list, tuple)) for v in data["locations"].values()):
+        for k, v in list(data["locations"].items()):
+            if isinstance(v, (list, tuple)) and len(v) == 2:
+                data["locations"][k] = {"lat": float(v[0]), "lon": float(v[1])}
+                dirty = True
 
     # Ensure settings keys exist
     if "settings" not in data or not isinstance(data["settings"], dict):
         data["settings"] = {}
+        dirty = True
     for k, v in DEFAULT_SETTINGS.items():
-        data["settings"].setdefault(k, v)
+        if k not in data["settings"]:
+            data["settings"][k] = v
+            dirty = True
+
+    # Only touch the file when something was actually migrated
+    if dirty:
+        save_locations(data)
 
     return data
 
 
 def save_locations(locations):
     # Keep the function name, but now we save both locations + settings in the same persistent file.
-    with open(LOCATIONS_FILE, "w") as f:
-        json.dump(locations, f, indent=2)
+    _write_json(LOCATIONS_FILE, locations)
 
 
 # -------------------------
 # Weather logic (DAILY ONLY, possible to add hourly)
 # -------------------------
+# Request parameters shared by every location; only latitude/longitude change per call
+_DAILY_PARAMS_BASE = {
+    "daily": [
+        "snowfall_sum",
+        "rain_sum",
+        "temperature_2m_max",
+        "temperature_2m_min",
+        "sunshine_duration",
+        "weather_code",
+    ],
+    "forecast_days": 16,
+    "timezone": "America/Denver",
+}
+
+
 def get_daily_forecast(lat, lon):
+    # Memoize the parsed forecast per location for the current hour (same window as the HTTP cache)
+    hour_bucket = int(time.time() // 3600)
+    return _cached_forecast(round(lat, 4), round(lon, 4), hour_bucket)
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_forecast(lat, lon, hour_bucket):
+    # hour_bucket is only part of the cache key; the returned arrays are shared, don't modify them
     url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": [
-            "snowfall_sum",
-            "rain_sum",
-            "temperature_2m_max",
-            "temperature_2m_min",
-            "sunshine_duration",
-            "weather_code",
-        ],
-	    "forecast_days": 16,
-        "timezone": "America/Denver",
-    }
+    params = {"latitude": lat, "longitude": lon, **_DAILY_PARAMS_BASE}
 
     response = openmeteo.weather_api(url, params=params)[0]
     daily = response.Daily()
 
-    dates = pd.date_range(
-        start=pd.to_datetime(daily.Time() + response.UtcOffsetSeconds(), unit="s", utc=True),
-        end=pd.to_datetime(daily.TimeEnd() + response.UtcOffsetSeconds(), unit="s", utc=True),
-        freq=pd.Timedelta(seconds=daily.Interval()),
-        inclusive="left",
-    )
+    # Local (naive) daily timestamps straight from the epoch seconds, no pandas Timestamps needed
+    offset = response.UtcOffsetSeconds()
+    ts = np.arange(daily.Time() + offset, daily.TimeEnd() + offset, daily.Interval(), dtype="int64")
+    dates = ts.astype("datetime64[s]")
+
+    # Plain numpy arrays per variable; a DataFrame only added construction cost for 16 rows
+    return {
+        "date": dates,
+        "snow": daily.Variables(0).ValuesAsNumpy(),  # Openmeteo issue - it was already in cm even if openmeteo config showed mm
+        "rain": daily.Variables(1).ValuesAsNumpy(),  # mm
+        "tmax": daily.Variables(2).ValuesAsNumpy(),  # °C
+        "tmin": daily.Variables(3).ValuesAsNumpy(),  # °C
+        "sun": daily.Variables(4).ValuesAsNumpy(),   # seconds
+        "code": daily.Variables(5).ValuesAsNumpy(),
+    }
 
-    df = pd.DataFrame({
-        "Date": dates.tz_localize(None),  # make it naive for easy .date() printing in Tkinter
-        "Snowfall (mm)": daily.Variables(0).ValuesAsNumpy(),
-        "Rain (mm)": daily.Variables(1).ValuesAsNumpy(),
-        "T max (°C)": daily.Variables(2).ValuesAsNumpy(),
-        "T min (°C)": daily.Variables(3).ValuesAsNumpy(),
-        "Sunshine duration (s)": daily.Variables(4).ValuesAsNumpy(),
-        "Weather code": daily.Variables(5).ValuesAsNumpy(),
-    })
 
-    return df
+# -------------------------
+# Forecast formatting
+# -------------------------
+# Fixed-width fields keep the Rain/Snow parts at the same columns on every line
+FMT = (
+    "{d} | Min: {tn:5.1f}°C | Max: {tx:5.1f}°C | Rain: {r:5.1f} mm | Snow: {s:5.1f} cm"
+    " | Sun: {h:4.1f} h | Code: {c}\n"
+)
+_FMT_SAMPLE = FMT.format(d="YYYY-MM-DD", tn=0.0, tx=0.0, r=0.0, s=0.0, h=0.0, c=0)
+RAIN_COL_START = _FMT_SAMPLE.index("Rain:")
+RAIN_COL_END = _FMT_SAMPLE.index(" mm") + len(" mm")
+SNOW_COL_START = _FMT_SAMPLE.index("Snow:")
+SNOW_COL_END = _FMT_SAMPLE.index(" cm") + len(" cm")
 
 
 # -------------------------
@@ -128,6 +198,9 @@ class WeatherApp(tk.Tk):
     def __init__(self):
         super().__init__()
 
+        # Forecast requests run here so the Tk loop never blocks on the network
+        self._pool = ThreadPoolExecutor(max_workers=2)
+
         self.title("Daily Weather Forecast")
         self.geometry("800x550")
 
@@ -144,6 +217,9 @@ class WeatherApp(tk.Tk):
         self.highlight_rain_enabled = tk.BooleanVar(value=settings.get("highlight_rain_enabled", True))
         self.highlight_rain_over_mm = tk.DoubleVar(value=settings.get("highlight_rain_over_mm", 1.0))
 
+        # Saves are coalesced via after(); make sure a pending one still lands on exit
+        self._pending_save = False
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def create_widgets(self):
         frame_top = tk.Frame(self)
@@ -155,16 +231,17 @@ class WeatherApp(tk.Tk):
         self.location_combo = ttk.Combobox(
             frame_top,
             textvariable=self.location_var,
-            values=list(self.locations.keys()),
+            values=list(self.locations),
+            # Refresh the dropdown from self.locations only when it is opened
+            postcommand=lambda: self.location_combo.configure(values=list(self.locations)),
             state="readonly",
             width=30,
         )
         self.location_combo.pack(side=tk.LEFT, padx=5)
         self.location_combo.current(0)
 
-        ttk.Button(frame_top, text="Get forecast", command=self.show_forecast).pack(
-            side=tk.LEFT, padx=5
-        )
+        self.forecast_button = ttk.Button(frame_top, text="Get forecast", command=self.show_forecast)
+        self.forecast_button.pack(side=tk.LEFT, padx=5)
 
         ttk.Button(frame_top, text="Add location", command=self.add_location_window).pack(
             side=tk.LEFT, padx=5
@@ -182,63 +259,96 @@ class WeatherApp(tk.Tk):
         self.output.pack(padx=10, pady=10)
 
     def persist_state(self):
+        # Coalesce rapid edits into a single write
+        if not self._pending_save:
+            self._pending_save = True
+            self.after(500, self._flush_state)
+
+    def _flush_state(self):
+        if not self._pending_save:
+            return
+        self._pending_save = False
         state = {
             "locations": self.locations,
             "settings": {
                 "highlight_snow_enabled": bool(self.highlight_snow_enabled.get()),
-                "highlight_snow_over_cm": float(self.highlight_snow_over_cm.get()),
+                "highlight_snow_over_cm": self.highlight_snow_over_cm.get(),
                 "highlight_rain_enabled": bool(self.highlight_rain_enabled.get()),
-                "highlight_rain_over_mm": float(self.highlight_rain_over_mm.get()),
+                "highlight_rain_over_mm": self.highlight_rain_over_mm.get(),
             },
         }
         save_locations(state)
 
+    def on_close(self):
+        try:
+            self._flush_state()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self.destroy()
+
     def show_forecast(self):
         location_name = self.location_var.get()
         loc = self.locations[location_name]
 
+        self.forecast_button.state(["disabled"])
+        fut = self._pool.submit(get_daily_forecast, loc["lat"], loc["lon"])
+        self.after(50, self._check_future, fut, location_name)
+
+    def _check_future(self, fut, location_name):
+        if not fut.done():
+            self.after(50, self._check_future, fut, location_name)
+            return
+
+        self.forecast_button.state(["!disabled"])
         try:
-            df = get_daily_forecast(loc["lat"], loc["lon"])
+            data = fut.result()
         except Exception as e:
             messagebox.showerror("Error", str(e))
             return
 
+        self.render_forecast(location_name, data)
+
+    def render_forecast(self, location_name, data):
+        # Read the Tk variables once; each .get() is a round-trip into Tcl
+        snow_on = bool(self.highlight_snow_enabled.get())
+        snow_thr = self.highlight_snow_over_cm.get()  # DoubleVar.get() already returns a float
+        rain_on = bool(self.highlight_rain_enabled.get())
+        rain_thr = self.highlight_rain_over_mm.get()
+
+        # Work on whole columns at once and format every line in one pass
+        dates = np.datetime_as_string(data["date"], unit="D")
+        tmin = data["tmin"]
+        tmax = data["tmax"]
+        rain_mm = data["rain"]
+        snow_cm = data["snow"]
+        sun_h = data["sun"] / 3600.0
+        codes = data["code"].astype(int)
+
+        header = f"Daily forecast for {location_name}\n" + "-" * 60 + "\n"
+        lines = [
+            FMT.format(d=d, tn=tn, tx=tx, r=r, s=sn, h=h, c=c)
+            for d, tn, tx, r, sn, h, c in zip(dates, tmin, tmax, rain_mm, snow_cm, sun_h, codes)
+        ]
+
+        # Replace the whole text in one insert instead of several per row
         self.output.delete("1.0", tk.END)
-        self.output.insert(tk.END, f"Daily forecast for {location_name}\n")
-        self.output.insert(tk.END, "-" * 60 + "\n")
-
-        for _, row in df.iterrows():
-                    date_str = str(row["Date"].date())
-
-                    tmin = float(row["T min (°C)"])
-                    tmax = float(row["T max (°C)"])
-
-                    rain_mm = float(row["Rain (mm)"])
-                    snow_cm = float(row["Snowfall (mm)"])   # Openmeteo issue - it was already in cm even if openmeteo config showed mm
-
-                    sun_h = float(row["Sunshine duration (s)"]) / 3600.0
-                    code = int(float(row["Weather code"]))
-
-                    # Insert line in pieces so we can tag-highlight just snow/rain parts
-                    self.output.insert(tk.END, f"{date_str} | Min: {tmin:.1f}°C | Max: {tmax:.1f}°C | ")
-
-                    # Rain part (highlight in red if enabled and above threshold)
-                    rain_text = f"Rain: {rain_mm:.1f} mm"
-                    if self.highlight_rain_enabled.get() and rain_mm > float(self.highlight_rain_over_mm.get()):
-                        self.output.insert(tk.END, rain_text, "rain_highlight")
-                    else:
-                        self.output.insert(tk.END, rain_text)
-
-                    self.output.insert(tk.END, " | ")
-
-                    # Snow part (highlight in yellow if enabled and above threshold)
-                    snow_text = f"Snow: {snow_cm:.1f} cm"
-                    if self.highlight_snow_enabled.get() and snow_cm > float(self.highlight_snow_over_cm.get()):
-                        self.output.insert(tk.END, snow_text, "snow_highlight")
-                    else:
-                        self.output.insert(tk.END, snow_text)
-
-                    self.output.insert(tk.END, f" | Sun: {sun_h:.1f} h | Code: {code}\n")
+        self.output.insert("1.0", header + "".join(lines))
+
+        # Tag just the snow/rain parts; Text lines are 1-based and rows start after the header
+        first_line = header.count("\n") + 1
+        # Only loop over the rows that actually need highlighting
+        rain_idx = np.flatnonzero(rain_mm > rain_thr) if rain_on else ()
+        snow_idx = np.flatnonzero(snow_cm > snow_thr) if snow_on else ()
+        # Call the Text widget's Tcl command directly with a prebuilt "tag add <name>" prefix
+        call = self.output.tk.call
+        rain_cmd = (str(self.output), "tag", "add", "rain_highlight")
+        snow_cmd = (str(self.output), "tag", "add", "snow_highlight")
+        for i in rain_idx:
+            lineno = first_line + i
+            call(*rain_cmd, f"{lineno}.{RAIN_COL_START}", f"{lineno}.{RAIN_COL_END}")
+        for i in snow_idx:
+            lineno = first_line + i
+            call(*snow_cmd, f"{lineno}.{SNOW_COL_START}", f"{lineno}.{SNOW_COL_END}")
 
     def add_location_window(self):
         win = tk.Toplevel(self)
@@ -273,7 +383,6 @@ class WeatherApp(tk.Tk):
             self.locations[name] = {"lat": lat, "lon": lon}
             self.persist_state()
 
-            self.location_combo["values"] = list(self.locations.keys())
             self.location_var.set(name)
             win.destroy()
 